@@ -0,0 +1,48 @@
+# app/files.py
+# Small filesystem helpers shared by server.py, app/pipeline.py and main.py.
+
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def from_root(path: str) -> Path:
+    """Settings paths are relative to the repo root unless absolute."""
+    p = Path(path)
+    return p if p.is_absolute() else ROOT / p
+
+
+def fingerprint(p: Path) -> Optional[int]:
+    """mtime_ns of p, or None if it doesn't exist."""
+    try:
+        return p.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+@lru_cache(maxsize=8)
+def _read_text(path: str, mtime_ns: int) -> str:
+    return Path(path).read_text(encoding="utf-8")
+
+
+def read_text_cached(p: Path) -> Optional[str]:
+    """
+    Contents of p (UTF-8), or None if it doesn't exist.
+    Cached on (path, mtime) so edits are picked up without a restart.
+    """
+    mtime_ns = fingerprint(p)
+    if mtime_ns is None:
+        return None
+    return _read_text(str(p), mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def ensure_dir(path: str) -> Path:
+    """mkdir once per directory for the life of the process; returns the directory."""
+    p = Path(path)
+    p.mkdir(parents=True, exist_ok=True)
+    return p
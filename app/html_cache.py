@@ -0,0 +1,39 @@
+# app/html_cache.py
+# Memoized BeautifulSoup parsing (and CSS selector compilation) for saved HTML files.
+# Parsing is the slowest step of every extraction helper, and a single request often
+# runs several of them (outline, selector suggestions, extraction) on the same file.
+# Shared by main.py and tools/ so each worker keeps one cache of parsed trees.
+
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+
+import soupsieve as sv
+from bs4 import BeautifulSoup
+
+
+@lru_cache(maxsize=8)
+def _parse(path: str, mtime_ns: int) -> BeautifulSoup:
+    """Parse once per (path, mtime); a rewritten file gets a fresh key."""
+    return BeautifulSoup(Path(path).read_text(encoding="utf-8"), "lxml")
+
+
+def load_soup(html_file: str) -> BeautifulSoup:
+    """
+    Return the parsed tree for html_file, reusing a cached parse while the file is unchanged.
+    Callers must treat the returned tree as read-only since it is shared.
+    """
+    p = Path(html_file).resolve()
+    return _parse(str(p), p.stat().st_mtime_ns)
+
+
+def clear_soup_cache() -> None:
+    """Drop all cached trees (call after writing new HTML to free memory early)."""
+    _parse.cache_clear()
+
+
+@lru_cache(maxsize=128)
+def compile_selector(selector: str) -> sv.SoupSieve:
+    """Compiled soupsieve pattern; repeat selectors skip re-parsing the CSS."""
+    return sv.compile(selector)
@@ -1,59 +1,116 @@
 # app/pipeline.py
 # Planner→Executor glue used by the API.
-# You can call run_pipeline(task_text) from app.py instead of hand-wiring planning/execution inline.
+# You can call run_pipeline(task_text) from server.py instead of hand-wiring planning/execution inline.
 
 from __future__ import annotations
 
+import os
+import uuid
 import asyncio
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from google import genai
 
+from app.files import ensure_dir, from_root, read_text_cached
+from app.plan_cache import lookup_plan, planner_fingerprint, store_plan
 from app.settings import get_settings
-from main import run_agent_for_api  # executor function provided in main.py
+from main import log_cache_usage, run_agent_for_api  # executor function provided in main.py
 
 
-def _load_planner_prompt(prompts_dir: str) -> str:
+def load_planner_prompt(prompts_dir: str) -> str:
     """
     Prefer 'prompts/abdul_task_breakdown.txt', else fallback to 'prompts/task_breakdown.txt'.
     Returns a minimal default if neither exists.
     """
-    p1 = Path(prompts_dir) / "abdul_task_breakdown.txt"
-    p2 = Path(prompts_dir) / "task_breakdown.txt"
-    if p1.exists():
-        return p1.read_text(encoding="utf-8")
-    if p2.exists():
-        return p2.read_text(encoding="utf-8")
+    for name in ("abdul_task_breakdown.txt", "task_breakdown.txt"):
+        text = read_text_cached(Path(prompts_dir) / name)
+        if text is not None:
+            return text
     return (
         "Break the user question into do-able steps: URLs to fetch, selectors/tables to extract, "
         "computations/plots to perform, and exact output shape (JSON array with base64 image if asked)."
     )
 
 
-def plan_with_gemini(task_text: str) -> str:
+# One Gemini client per process so planner calls reuse its pooled connection.
+# Built from settings on first use; the FastAPI lifespan warms it up and closes it.
+_GEMINI: Optional[genai.Client] = None
+
+
+def get_gemini_client() -> genai.Client:
+    global _GEMINI
+    if _GEMINI is None:
+        st = get_settings()
+        if not st.GEMINI_API_KEY:
+            raise RuntimeError("Missing GEMINI_API_KEY")
+        _GEMINI = genai.Client(api_key=st.GEMINI_API_KEY)
+    return _GEMINI
+
+
+async def warm_up_gemini() -> None:
     """
-    Calls Gemini with the task + planning prompt and writes the plan to outputs/abdul_breaked_task.txt.
-    Returns the plan string.
+    Best-effort: fetch the planner model's metadata at startup so the first plan
+    doesn't pay for DNS + TLS handshake. Failures (including a missing key) are ignored.
     """
-    st = get_settings()
+    try:
+        client = get_gemini_client()
+        await asyncio.wait_for(client.aio.models.get(model=get_settings().GEMINI_MODEL), timeout=5)
+    except Exception:
+        pass
+
 
-    if not st.GEMINI_API_KEY:
-        raise RuntimeError("Missing GEMINI_API_KEY")
+async def close_gemini_client() -> None:
+    """Close the shared client's connections (no-op if it was never built)."""
+    global _GEMINI
+    if _GEMINI is not None:
+        client, _GEMINI = _GEMINI, None
+        await client.aio.aclose()
+        client.close()
 
-    client = genai.Client(api_key=st.GEMINI_API_KEY)
-    prompt_text = _load_planner_prompt(st.PROMPTS_DIR)
 
-    resp = client.models.generate_content(
-        model=st.GEMINI_MODEL,
-        contents=[task_text, prompt_text],
+async def _generate_plan(task_text: str, prompt_text: str) -> str:
+    st = get_settings()
+    client = get_gemini_client()
+
+    # Static planning prompt first so Gemini's implicit prefix cache can reuse it
+    resp = await asyncio.wait_for(
+        client.aio.models.generate_content(
+            model=st.GEMINI_MODEL,
+            contents=[prompt_text, task_text],
+            config={"max_output_tokens": st.PLANNER_MAX_OUTPUT_TOKENS},
+        ),
+        timeout=st.PLANNER_TIMEOUT,
     )
+    usage = resp.usage_metadata
+    if usage is not None:
+        await asyncio.to_thread(
+            log_cache_usage, "planner", usage.prompt_token_count, usage.cached_content_token_count
+        )
+
+    return (resp.text or "").strip()
+
 
-    plan = (resp.text or "").strip()
-    # Persist plan
-    out_path = Path(st.PLAN_FILE)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(plan, encoding="utf-8")
+async def plan_with_gemini(task_text: str, use_cache: bool = True) -> str:
+    """
+    Returns a plan for the task, reusing a cached plan for an identical or very similar
+    task when available; otherwise calls Gemini (bounded by PLANNER_MAX_OUTPUT_TOKENS /
+    PLANNER_TIMEOUT) and caches the result. use_cache=False skips the lookup but still
+    refreshes the stored plan. Writes the plan to outputs/abdul_breaked_task_<pid>_<uuid>.txt.
+    """
+    st = get_settings()
+    prompt_text = load_planner_prompt(str(from_root(st.PROMPTS_DIR)))
+    planner = planner_fingerprint(st.GEMINI_MODEL, prompt_text)
+
+    plan = await asyncio.to_thread(lookup_plan, task_text, planner) if use_cache else None
+    if plan is None:
+        plan = await _generate_plan(task_text, prompt_text)
+        await asyncio.to_thread(store_plan, task_text, plan, planner)
+
+    # Persist plan (unique per call so multiple workers never share a writer)
+    base = from_root(st.PLAN_FILE)
+    out_path = ensure_dir(str(base.parent)) / f"{base.stem}_{os.getpid()}_{uuid.uuid4().hex}{base.suffix}"
+    await asyncio.to_thread(out_path.write_text, plan, encoding="utf-8")
     return plan
 
 
@@ -66,11 +123,11 @@ async def execute_with_executor(task_text: str, plan_text: str) -> List:
     return await asyncio.wait_for(run_agent_for_api(task_text, plan_text), timeout=st.EXECUTOR_TIMEOUT)
 
 
-async def run_pipeline(task_text: str) -> List:
+async def run_pipeline(task_text: str, use_cache: bool = True) -> List:
     """
     High-level helper: plan → execute → return JSON array.
-    Use this from your FastAPI route if you prefer keeping app.py thin.
+    Use this from your FastAPI route if you prefer keeping server.py thin.
     """
-    plan = plan_with_gemini(task_text)
+    plan = await plan_with_gemini(task_text, use_cache=use_cache)
     result = await execute_with_executor(task_text, plan)
     return result
@@ -0,0 +1,222 @@
+# app/plan_cache.py
+# Persistent planner cache so near-identical tasks skip the Gemini call.
+# - Exact hits: sha256 of the planner fingerprint (model + prompt) and the normalized task text.
+#   Editing the planner prompt or switching GEMINI_MODEL therefore turns old plans into misses.
+# - Semantic hits (opt-in): sentence-transformers embeddings, cosine >= PLAN_CACHE_SIMILARITY,
+#   and only between tasks that reference exactly the same URLs. Enabled when
+#   PLAN_CACHE_EMBED_MODEL is set and `sentence-transformers` is installed.
+# Eviction is LFU: every hit bumps a counter and the least-used plans go first.
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.files import from_root
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # semantic lookup is optional
+    np = None
+    SentenceTransformer = None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key       TEXT PRIMARY KEY,
+    planner   TEXT NOT NULL,
+    task      TEXT NOT NULL,
+    plan      TEXT NOT NULL,
+    embedding BLOB,
+    hits      INTEGER NOT NULL DEFAULT 0,
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+_URL_RE = re.compile(r"https?://[^\s<>\"'`\]]+")
+
+
+def _normalize(task_text: str) -> str:
+    """
+    Collapse whitespace so trivially different uploads share a key.
+    Case is kept: URLs (e.g. Wikipedia titles) are case-sensitive.
+    """
+    return re.sub(r"\s+", " ", task_text).strip()
+
+
+def _clean_url(url: str) -> str:
+    """Drop trailing sentence punctuation; keep ")" only when balanced (e.g. Titanic_(1997_film))."""
+    while url and (url[-1] in ".,;:" or (url[-1] == ")" and url.count(")") > url.count("("))):
+        url = url[:-1]
+    return url
+
+
+def _urls(task_text: str) -> frozenset:
+    return frozenset(_clean_url(u) for u in _URL_RE.findall(task_text))
+
+
+def planner_fingerprint(model: str, prompt_text: str) -> str:
+    """Identifies the planner configuration a plan was produced with."""
+    return hashlib.sha256(f"{model}\0{prompt_text}".encode("utf-8")).hexdigest()
+
+
+def _task_key(task_text: str, planner: str) -> str:
+    return hashlib.sha256(f"{planner}\0{_normalize(task_text)}".encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _embedder(model_name: str):
+    return SentenceTransformer(model_name)
+
+
+class PlanCache:
+    """
+    SQLite-backed plan store. Methods are blocking; call them via asyncio.to_thread
+    from async code. A new connection is opened per call so instances are thread-safe.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 512,
+        similarity: float = 0.92,
+        embed_model: Optional[str] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.similarity = similarity
+        # Semantic hits need both a model name and the optional dependency
+        self.embed_model = embed_model if (embed_model and SentenceTransformer is not None) else None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _embed(self, task_text: str):
+        vec = _embedder(self.embed_model).encode(_normalize(task_text), normalize_embeddings=True)
+        return np.asarray(vec, dtype=np.float32)
+
+    def get(self, task_text: str, planner: str) -> Optional[str]:
+        """
+        Return a plan cached for task_text under the same planner fingerprint
+        (exact, then semantic match) or None.
+        """
+        key = _task_key(task_text, planner)
+        with self._connect() as conn:
+            row = conn.execute("SELECT plan FROM plans WHERE key = ?", (key,)).fetchone()
+            if row is None and self.embed_model:
+                key, row = self._semantic_lookup(conn, task_text, planner)
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE plans SET hits = hits + 1, last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            return row[0]
+
+    def _semantic_lookup(self, conn: sqlite3.Connection, task_text: str, planner: str):
+        rows = conn.execute(
+            "SELECT key, task, plan, embedding FROM plans WHERE planner = ? AND embedding IS NOT NULL",
+            (planner,),
+        ).fetchall()
+        # A similar-looking task about a different page needs a different plan
+        urls = _urls(task_text)
+        rows = [(key, plan, emb) for key, task, plan, emb in rows if _urls(task) == urls]
+        if not rows:
+            return None, None
+        query = self._embed(task_text)
+        matrix = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+        scores = matrix @ query  # embeddings are unit-normalized, so this is cosine
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None, None
+        return rows[best][0], (rows[best][1],)
+
+    def put(self, task_text: str, plan: str, planner: str) -> None:
+        """Store (or refresh) the plan for task_text and evict least-frequently-used overflow."""
+        if not plan:
+            return
+        embedding = self._embed(task_text).tobytes() if self.embed_model else None
+        now = time.time()
+        with self._connect() as conn:
+            key = _task_key(task_text, planner)
+            conn.execute(
+                """
+                INSERT INTO plans (key, planner, task, plan, embedding, hits, created, last_used)
+                VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    plan = excluded.plan, embedding = excluded.embedding, last_used = excluded.last_used
+                """,
+                (key, planner, task_text, plan, embedding, now, now),
+            )
+            # The fresh entry is always kept; otherwise a full cache could never admit new plans
+            conn.execute(
+                """
+                DELETE FROM plans WHERE key IN (
+                    SELECT key FROM plans WHERE key != ?
+                    ORDER BY hits DESC, last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (key, max(self.max_entries - 1, 0)),
+            )
+
+
+@lru_cache(maxsize=1)
+def get_plan_cache() -> Optional[PlanCache]:
+    """
+    Cached accessor built from settings. Returns None when PLAN_CACHE_ENABLED is off.
+    """
+    st = get_settings()
+    if not st.PLAN_CACHE_ENABLED:
+        return None
+    return PlanCache(
+        str(from_root(st.PLAN_CACHE_PATH)),
+        max_entries=st.PLAN_CACHE_MAX_ENTRIES,
+        similarity=st.PLAN_CACHE_SIMILARITY,
+        embed_model=st.PLAN_CACHE_EMBED_MODEL,
+    )
+
+
+def lookup_plan(task_text: str, planner: str) -> Optional[str]:
+    """
+    Cached plan for the task, or None. The cache is an optimization only: any failure
+    (locked database, embedding model that won't load, ...) is logged and counts as a miss.
+    """
+    try:
+        cache = get_plan_cache()
+        return cache.get(task_text, planner) if cache is not None else None
+    except Exception:
+        logger.warning("Plan cache lookup failed; treating as a miss", exc_info=True)
+        return None
+
+
+def store_plan(task_text: str, plan: str, planner: str) -> None:
+    """Best-effort store; failures are logged so an already generated plan is still used."""
+    try:
+        cache = get_plan_cache()
+        if cache is not None:
+            cache.put(task_text, plan, planner)
+    except Exception:
+        logger.warning("Plan cache store failed", exc_info=True)
@@ -4,37 +4,89 @@
 from __future__ import annotations
 
 import os
+from dataclasses import dataclass
 from functools import lru_cache
+from typing import Mapping, Optional
 
 
+@dataclass(frozen=True)
 class Settings:
     """
-    All configuration is read from environment variables.
+    All configuration is read from environment variables (see get_settings()).
     Do NOT commit secrets; set them in your hosting provider (e.g., Railway Variables).
     """
 
     # --- API keys / endpoints ---
-    GEMINI_API_KEY: str | None = os.getenv("GEMINI_API_KEY")          # Planner (Gemini)
-    OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")          # Executor (OpenAI)
-    OPENAI_BASE: str = os.getenv("OPENAI_BASE", "https://api.openai.com")
+    GEMINI_API_KEY: Optional[str] = None          # Planner (Gemini)
+    OPENAI_API_KEY: Optional[str] = None          # Executor (OpenAI)
+    OPENAI_BASE: str = "https://api.openai.com"
 
     # --- Models ---
-    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-lite")
-    EXECUTOR_MODEL: str = os.getenv("EXECUTOR_MODEL", "gpt-4o-mini")
+    GEMINI_MODEL: str = "gemini-2.0-flash-lite"
+    EXECUTOR_MODEL: str = "gpt-4o-mini"
 
     # --- Time budgets (seconds) ---
     # Outer timeout used by the API when waiting on the executor.
-    EXECUTOR_TIMEOUT: int = int(os.getenv("EXECUTOR_TIMEOUT", "170"))
+    EXECUTOR_TIMEOUT: int = 170
     # Inner guard used by the tool-calling loop inside the executor.
-    TOOL_LOOP_BUDGET: int = int(os.getenv("TOOL_LOOP_BUDGET", "110"))
+    TOOL_LOOP_BUDGET: int = 110
+    # Per-call guards so one hung LLM call cannot eat the whole outer budget.
+    PLANNER_TIMEOUT: int = 20
+    # Executor read timeout: this allowance plus the time to generate EXECUTOR_MAX_TOKENS
+    # at EXECUTOR_MIN_TOKENS_PER_SEC, capped by what is left of TOOL_LOOP_BUDGET.
+    EXECUTOR_CALL_TIMEOUT: int = 45
+    EXECUTOR_MIN_TOKENS_PER_SEC: int = 100
+
+    # --- Generation limits / retries ---
+    PLANNER_MAX_OUTPUT_TOKENS: int = 1024
+    # gpt-4o-mini's own output limit: the final answer repeats the base64 plot
+    # (~7k tokens for a plain scatter), so a tighter cap truncates the JSON.
+    EXECUTOR_MAX_TOKENS: int = 16384
+    # Attempts per executor chat turn (retried on connect/pool timeouts and 5xx;
+    # a read timeout means generation itself was too slow, so it is not retried).
+    EXECUTOR_MAX_RETRIES: int = 3
+
+    # --- Per-worker tool concurrency ---
+    # Simultaneous Playwright scrapes / generated-code subprocesses; extra calls wait.
+    PLAYWRIGHT_CONCURRENCY: int = 2
+    CODE_EXEC_CONCURRENCY: int = 4
+
+    # --- Planner cache ---
+    PLAN_CACHE_ENABLED: bool = True
+    PLAN_CACHE_PATH: str = "outputs/plan_cache.sqlite3"
+    PLAN_CACHE_MAX_ENTRIES: int = 512
+    # Cosine threshold for semantic hits (needs sentence-transformers installed).
+    PLAN_CACHE_SIMILARITY: float = 0.92
+    # Semantic matching is opt-in (e.g. "sentence-transformers/all-MiniLM-L6-v2");
+    # empty keeps the cache exact-match only.
+    PLAN_CACHE_EMBED_MODEL: str = ""
 
     # --- Paths (relative to repo root unless absolute) ---
-    OUTPUTS_DIR: str = os.getenv("OUTPUTS_DIR", "outputs")
-    PLAN_FILE: str = os.getenv("PLAN_FILE", "outputs/abdul_breaked_task.txt")
-    PROMPTS_DIR: str = os.getenv("PROMPTS_DIR", "prompts")
+    OUTPUTS_DIR: str = "outputs"
+    PLAN_FILE: str = "outputs/abdul_breaked_task.txt"
+    PROMPTS_DIR: str = "prompts"
 
     # --- Misc ---
-    ENV: str = os.getenv("ENV", "production")
+    ENV: str = "production"
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str]) -> "Settings":
+        """Build settings from an environment mapping; unset variables keep the defaults above."""
+        kwargs = {}
+        for name, field in cls.__dataclass_fields__.items():
+            raw = env.get(name)
+            if raw is None:
+                continue
+            default = field.default
+            if isinstance(default, bool):
+                kwargs[name] = raw.strip().lower() not in ("0", "false", "no", "")
+            elif isinstance(default, int):
+                kwargs[name] = int(raw)
+            elif isinstance(default, float):
+                kwargs[name] = float(raw)
+            else:
+                kwargs[name] = raw
+        return cls(**kwargs)
 
     # Helpers (optional)
     def require_keys(self) -> None:
@@ -54,10 +106,11 @@ class Settings:
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """
-    Cached accessor for settings.
+    Cached accessor for settings, read from os.environ on first call (not at import).
+    Call get_settings.cache_clear() to re-read the environment without a restart.
     Usage:
         from app.settings import get_settings
         st = get_settings()
         st.require_keys()  # optional strict check
     """
-    return Settings()
+    return Settings.from_env(os.environ)
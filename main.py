@@ -18,13 +18,18 @@ import sys
 import json
 import time
 import asyncio
-import subprocess
+import uuid
+import random
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 import httpx
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
+from playwright.async_api import Browser, Playwright, Route, async_playwright
+
+from app.files import ensure_dir
+from app.html_cache import clear_soup_cache, compile_selector, load_soup
+from app.settings import get_settings
 
 # -----------------------------------------------------------------------------
 # Paths
@@ -34,32 +39,178 @@ OUTPUTS = ROOT / "outputs"
 OUTPUTS.mkdir(parents=True, exist_ok=True)
 
 GPT_RESP_PATH = OUTPUTS / "gpt_response.json"
+PROMPT_CACHE_LOG = OUTPUTS / "prompt_cache.jsonl"
 SCRAPED_HTML_DEFAULT = OUTPUTS / "scraped_content.html"
-TEMP_SCRIPT_PATH = OUTPUTS / "temp_script.py"
+
+# Inner guard for generated code run by answer_questions (seconds)
+CODE_EXEC_TIMEOUT = 90
+
+# Per-worker caps on the memory-heavy tools: each Chromium context is ~80 MB and
+# each generated script loads pandas/matplotlib. Excess calls queue instead of OOMing.
+# Built on first use (keyed by size) so the limits come from the current settings.
+@lru_cache(maxsize=None)
+def _semaphore(name: str, size: int) -> asyncio.Semaphore:
+    return asyncio.Semaphore(size)
+
+# -----------------------------------------------------------------------------
+# Shared HTTP clients (executor LLM, scraper fast path)
+# -----------------------------------------------------------------------------
+# One pooled client for the whole process so keep-alive sockets and TLS sessions
+# are reused across tool-loop turns. Closed by the FastAPI lifespan in server.py.
+# No base_url: OPENAI_BASE is read from settings per request, not frozen at import.
+HTTP = httpx.AsyncClient(
+    timeout=httpx.Timeout(connect=10, read=90, write=30, pool=5),
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=30),
+)
+
+
+def _executor_url(path: str) -> str:
+    return get_settings().OPENAI_BASE.rstrip("/") + path
+
+
+async def warm_up_http() -> None:
+    """
+    Best-effort: open a pooled TLS connection to the executor host at startup so the
+    first real chat turn doesn't pay for DNS + handshake. Failures are ignored.
+    """
+    try:
+        await HTTP.head(_executor_url("/"), timeout=5)
+    except httpx.HTTPError:
+        pass
+
+
+# Separate pool for the scraper fast path (plain GETs to arbitrary hosts).
+# HTTP/2 only when the optional `h2` package is installed.
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+HTTP_SCRAPER = httpx.AsyncClient(
+    http2=_HTTP2,
+    follow_redirects=True,
+    timeout=httpx.Timeout(15, connect=10),
+    limits=httpx.Limits(max_connections=64),
+    headers={
+        "User-Agent": (
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+        ),
+    },
+)
+
+# -----------------------------------------------------------------------------
+# Shared browser (Playwright)
+# -----------------------------------------------------------------------------
+# Chromium is launched once per process and each scrape gets its own cheap,
+# isolated BrowserContext. server.py starts/stops it from the FastAPI lifespan;
+# other callers (CLI) get it launched lazily on first use.
+_PLAYWRIGHT: Optional[Playwright] = None
+_BROWSER: Optional[Browser] = None
+_BROWSER_LOCK = asyncio.Lock()
+
+# Most containers (Railway) need these flags
+BROWSER_LAUNCH_ARGS = ["--no-sandbox", "--disable-setuid-sandbox"]
+
+# Sub-resources that never affect the saved HTML. Scripts are deliberately allowed:
+# pages that reach Playwright are the ones that may need JS to render their DOM.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
+
+async def start_browser() -> Browser:
+    """Return the shared Chromium instance, launching (or relaunching) it if needed."""
+    global _PLAYWRIGHT, _BROWSER
+    async with _BROWSER_LOCK:
+        if _BROWSER is None or not _BROWSER.is_connected():
+            if _PLAYWRIGHT is None:
+                _PLAYWRIGHT = await async_playwright().start()
+            _BROWSER = await _PLAYWRIGHT.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS)
+        return _BROWSER
+
+
+async def stop_browser() -> None:
+    """Close the shared browser and Playwright driver (no-op if never started)."""
+    global _PLAYWRIGHT, _BROWSER
+    async with _BROWSER_LOCK:
+        if _BROWSER is not None:
+            await _BROWSER.close()
+            _BROWSER = None
+        if _PLAYWRIGHT is not None:
+            await _PLAYWRIGHT.stop()
+            _PLAYWRIGHT = None
+
+
+async def _block_heavy_assets(route: Route) -> None:
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
 
 # -----------------------------------------------------------------------------
 # Tools
 # -----------------------------------------------------------------------------
+def _save_html(output_file: str, content: str) -> str:
+    out_path = Path(output_file)
+    ensure_dir(str(out_path.parent))
+    # Write aside and rename: readers in other threads see the old page or the new one,
+    # never a half-written file (which they would also cache as a truncated tree)
+    tmp_path = out_path.with_name(f".{out_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    clear_soup_cache()
+    return str(out_path)
+
+
+def _looks_static(r: httpx.Response) -> bool:
+    """Heuristic: a real server-rendered page, not an error or an empty JS shell."""
+    if r.status_code != 200 or len(r.text) <= 1024:
+        return False
+    html = r.text.lower()
+    return "<table" in html or "<main" in html
+
+
+async def scrape_via_http(url: str) -> Optional[str]:
+    """
+    Fetch url with plain HTTP. Returns the HTML if it looks usable as-is,
+    else None so the caller can fall back to a real browser.
+    """
+    try:
+        r = await HTTP_SCRAPER.get(url)
+    except httpx.HTTPError:
+        return None
+    return r.text if _looks_static(r) else None
+
+
 async def scrape_website(url: str, output_file: str = str(SCRAPED_HTML_DEFAULT)) -> Dict[str, Any]:
     """
-    Scrape the given URL using Playwright (Chromium) and save HTML to output_file.
+    Scrape the given URL and save HTML to output_file. Static pages are fetched with
+    plain HTTP; Playwright (Chromium) is only used when that doesn't yield usable HTML.
     Returns a small JSON payload confirming the write.
     """
-    # Most containers (Railway) need these flags
-    launch_args = ["--no-sandbox", "--disable-setuid-sandbox"]
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True, args=launch_args)
-        page = await browser.new_page()
+    content = await scrape_via_http(url)
+    if content is not None:
+        saved = await asyncio.to_thread(_save_html, output_file, content)
+        return {"ok": True, "file": saved, "url": url, "via": "http"}
+
+    async with _semaphore("browser", get_settings().PLAYWRIGHT_CONCURRENCY):
+        browser = await start_browser()
+        ctx = await browser.new_context()
         try:
+            page = await ctx.new_page()
+            await page.route("**/*", _block_heavy_assets)
             await page.goto(url, wait_until="domcontentloaded", timeout=60_000)
             content = await page.content()
-            out_path = Path(output_file)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(content, encoding="utf-8")
-            return {"ok": True, "file": str(out_path), "url": url}
         finally:
-            await browser.close()
+            await ctx.close()
+
+    saved = await asyncio.to_thread(_save_html, output_file, content)
+    return {"ok": True, "file": saved, "url": url, "via": "browser"}
 
 
 def get_relevant_data(file_name: str, js_selector: Optional[str] = None) -> Dict[str, Any]:
@@ -67,11 +218,10 @@ def get_relevant_data(file_name: str, js_selector: Optional[str] = None) -> Dict
     Extract text from a saved HTML file using a CSS selector (if provided).
     Returns a JSON-serializable dict.
     """
-    html = Path(file_name).read_text(encoding="utf-8")
-    soup = BeautifulSoup(html, "html.parser")
+    soup = load_soup(file_name)
 
     if js_selector:
-        elements = soup.select(js_selector)
+        elements = compile_selector(js_selector).select(soup)
         return {
             "data": [el.get_text(strip=True) for el in elements],
             "count": len(elements),
@@ -82,25 +232,52 @@ def get_relevant_data(file_name: str, js_selector: Optional[str] = None) -> Dict
     return {"data": soup.get_text(separator=" ", strip=True)}
 
 
+async def _kill_process(proc: asyncio.subprocess.Process) -> None:
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        pass  # already exited
+    await proc.wait()
+
+
 async def answer_questions(code: str) -> str:
     """
     Write provided Python code and run it. The code MUST print ONLY the final JSON array.
     Returns stdout from the script (should be a JSON array string).
     """
-    TEMP_SCRIPT_PATH.write_text(code, encoding="utf-8")
-
-    proc = subprocess.run(
-        [sys.executable, str(TEMP_SCRIPT_PATH)],
-        capture_output=True,
-        text=True,
-        env={**os.environ},  # inherit env
-    )
+    # Unique per call so concurrent requests never clobber each other's script
+    script_path = OUTPUTS / f"tmp_{uuid.uuid4().hex}.py"
+    await asyncio.to_thread(script_path.write_text, code, encoding="utf-8")
 
-    if proc.returncode != 0 and not proc.stdout.strip():
+    try:
+        async with _semaphore("code", get_settings().CODE_EXEC_CONCURRENCY):
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable,
+                str(script_path),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env={**os.environ},  # inherit env
+            )
+            try:
+                stdout_b, stderr_b = await asyncio.wait_for(proc.communicate(), timeout=CODE_EXEC_TIMEOUT)
+            except asyncio.TimeoutError:
+                await _kill_process(proc)
+                return json.dumps({"error": "code_timeout", "stderr": f"Script exceeded {CODE_EXEC_TIMEOUT}s"})
+            except BaseException:
+                # Cancelled (outer request timeout, sibling failure): don't orphan the child
+                await _kill_process(proc)
+                raise
+    finally:
+        script_path.unlink(missing_ok=True)
+
+    stdout = stdout_b.decode("utf-8", errors="replace")
+    stderr = stderr_b.decode("utf-8", errors="replace")
+
+    if proc.returncode != 0 and not stdout.strip():
         # Return a JSON error string so the model can see it as tool output
-        return json.dumps({"error": "code_failed", "stderr": proc.stderr})
+        return json.dumps({"error": "code_failed", "stderr": stderr})
 
-    return proc.stdout
+    return stdout
 
 
 # Tool schema shared with the model
@@ -160,54 +337,120 @@ tools: List[Dict[str, Any]] = [
 # -----------------------------------------------------------------------------
 # Orchestration helpers
 # -----------------------------------------------------------------------------
-def _system_prompt() -> str:
-    # If you keep prompts/output_contract.txt, you could append it here.
-    return (
-        "You are an execution agent. Use tools to: (1) fetch the target page, "
-        "(2) extract the necessary data, (3) when ready, generate complete Python code and call "
-        "'answer_questions' with it. The code MUST print ONLY the final JSON array required by the task, "
-        "e.g., [1, \"Titanic\", 0.485782, \"data:image/png;base64,...\"]. "
-        "Do not include explanations in your final assistant message—return only the JSON array."
-    )
-
+# Built once; byte-identical on every turn so it stays a cacheable prompt prefix.
+# If you keep prompts/output_contract.txt, you could append it here.
+SYSTEM_PROMPT = (
+    "You are an execution agent. Use tools to: (1) fetch the target page, "
+    "(2) extract the necessary data, (3) when ready, generate complete Python code and call "
+    "'answer_questions' with it. The code MUST print ONLY the final JSON array required by the task, "
+    "e.g., [1, \"Titanic\", 0.485782, \"data:image/png;base64,...\"]. "
+    "Do not include explanations in your final assistant message—return only the JSON array."
+)
+
+
+async def _post_with_backoff(
+    payload: Dict[str, Any], headers: Dict[str, str], read_timeout: float
+) -> httpx.Response:
+    """
+    POST a chat completion, retrying connect/pool timeouts and 5xx responses with
+    exponential backoff. Read timeouts and other HTTP errors are raised immediately.
+    """
+    st = get_settings()
+    timeout = httpx.Timeout(connect=10, read=read_timeout, write=30, pool=5)
+    attempts = max(1, st.EXECUTOR_MAX_RETRIES)
 
-def _chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    for attempt in range(attempts):
+        try:
+            r = await HTTP.post(
+                _executor_url("/v1/chat/completions"), headers=headers, json=payload, timeout=timeout
+            )
+            r.raise_for_status()
+            return r
+        except httpx.ReadTimeout:
+            # The model was still generating; a retry would just time out again
+            raise
+        except httpx.TimeoutException:
+            if attempt == attempts - 1:
+                raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code < 500 or attempt == attempts - 1:
+                raise
+        # 0.5s, 1s, 2s, ... plus jitter so parallel requests don't retry in lockstep
+        await asyncio.sleep(0.5 * (2 ** attempt) + random.uniform(0, 0.25))
+
+    raise RuntimeError("unreachable")
+
+
+async def _chat(messages: List[Dict[str, Any]], budget: float) -> Dict[str, Any]:
     """
     Single chat turn to the OpenAI Chat Completions API with tools enabled.
+    budget is the time (seconds) left in the tool loop.
     Returns the assistant message object.
     """
-    base = os.getenv("OPENAI_BASE", "https://api.openai.com").rstrip("/")
-    token = os.getenv("OPENAI_API_KEY")
-    if not token:
+    st = get_settings()
+    if not st.OPENAI_API_KEY:
         raise RuntimeError("Missing OPENAI_API_KEY environment variable")
 
-    url = f"{base}/v1/chat/completions"
-    model = os.getenv("EXECUTOR_MODEL", "gpt-4o-mini")
+    # Non-streamed: nothing arrives until the whole reply is generated
+    read_timeout = st.EXECUTOR_CALL_TIMEOUT + st.EXECUTOR_MAX_TOKENS / max(1, st.EXECUTOR_MIN_TOKENS_PER_SEC)
 
-    with httpx.Client(timeout=120) as client:
-        r = client.post(
-            url,
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": model,
-                "messages": messages,
-                "tools": tools,
-                "tool_choice": "auto",
-            },
-        )
-        r.raise_for_status()
-        data = r.json()
+    r = await _post_with_backoff(
+        {
+            "model": st.EXECUTOR_MODEL,
+            "messages": messages,
+            "tools": tools,
+            "tool_choice": "auto",
+            "max_tokens": st.EXECUTOR_MAX_TOKENS,
+        },
+        headers={
+            "Authorization": f"Bearer {st.OPENAI_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        read_timeout=max(1.0, min(read_timeout, budget)),
+    )
+    data = r.json()
 
     # Save raw for debugging
     try:
-        GPT_RESP_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        await asyncio.to_thread(
+            GPT_RESP_PATH.write_text, json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
     except Exception:
         pass
 
-    return data["choices"][0]["message"]
+    usage = data.get("usage") or {}
+    await asyncio.to_thread(
+        log_cache_usage,
+        "executor",
+        usage.get("prompt_tokens"),
+        (usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+    )
+
+    choice = data["choices"][0]
+    if choice.get("finish_reason") == "length":
+        raise RuntimeError(
+            f"Executor reply was cut off at max_tokens={st.EXECUTOR_MAX_TOKENS}; "
+            "raise EXECUTOR_MAX_TOKENS (up to the model's output limit)"
+        )
+    return choice["message"]
+
+
+def log_cache_usage(source: str, prompt_tokens: Optional[int], cached_tokens: Optional[int]) -> None:
+    """
+    Append one line of prompt-cache stats to outputs/prompt_cache.jsonl.
+    Used to verify that the static prompt prefixes actually hit the provider caches.
+    """
+    entry = {
+        "ts": time.time(),
+        "source": source,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens or 0,
+    }
+    try:
+        with PROMPT_CACHE_LOG.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except Exception:
+        pass
 
 
 def _parse_args(raw: Any) -> Dict[str, Any]:
@@ -228,13 +471,62 @@ async def _call_tool(name: str, args: Dict[str, Any]) -> str:
         res = await scrape_website(**args)
         return json.dumps(res)
     if name == "get_relevant_data":
-        res = get_relevant_data(**args)
+        # CPU-bound parsing; run in a thread so batched tool calls can overlap
+        res = await asyncio.to_thread(get_relevant_data, **args)
         return json.dumps(res)
     if name == "answer_questions":
         return await answer_questions(**args)
     return json.dumps({"ok": False, "error": f"Unknown tool '{name}'"})
 
 
+async def _call_tool_safe(name: str, args: Dict[str, Any]) -> str:
+    try:
+        return await _call_tool(name, args)
+    except Exception as e:
+        # Surface the failure to the model so it can retry or adapt
+        return json.dumps({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+def _tool_file(name: str, args: Dict[str, Any]) -> Optional[str]:
+    """The HTML file a tool call writes or reads, or None if it may touch anything."""
+    if name == "scrape_website":
+        path = args.get("output_file") or str(SCRAPED_HTML_DEFAULT)
+    elif name == "get_relevant_data":
+        path = args.get("file_name")
+    else:
+        return None
+    return str(Path(path).resolve()) if isinstance(path, str) and path else None
+
+
+async def _run_tool_calls(calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+    """
+    Run one assistant turn's tool calls and return their outputs in call order.
+    Calls on the same file run in call order (a scrape and the extraction that reads it
+    are often batched together); calls on different files overlap. Generated code can
+    read any file, so answer_questions waits for everything before it and runs alone.
+    """
+    results: List[str] = [""] * len(calls)
+    chains: Dict[str, List[int]] = {}
+
+    async def run_chain(indices: List[int]) -> None:
+        for i in indices:
+            results[i] = await _call_tool_safe(*calls[i])
+
+    async def flush() -> None:
+        await asyncio.gather(*(run_chain(indices) for indices in chains.values()))
+        chains.clear()
+
+    for i, (name, args) in enumerate(calls):
+        path = _tool_file(name, args)
+        if path is None:
+            await flush()
+            await run_chain([i])
+        else:
+            chains.setdefault(path, []).append(i)
+    await flush()
+    return results
+
+
 # -----------------------------------------------------------------------------
 # Public entry for API
 # -----------------------------------------------------------------------------
@@ -244,21 +536,25 @@ async def run_agent_for_api(task: str, plan: str = "") -> list:
     Returns the FINAL JSON array as a Python list.
     Raises on timeout or invalid final JSON.
     """
+    # Static content first (system prompt, tool schema, fixed instruction) so the
+    # provider's automatic prompt cache can reuse the prefix; task/plan go last.
     messages: List[Dict[str, Any]] = [
-        {"role": "system", "content": _system_prompt()},
+        {"role": "system", "content": SYSTEM_PROMPT},
         {
             "role": "user",
-            "content": f"{task}\n\nPlan:\n{plan}\n\nUse the tools. When done, return ONLY the final JSON array.",
+            "content": f"Use the tools. When done, return ONLY the final JSON array.\n\nTask:\n{task}\n\nPlan:\n{plan}",
         },
     ]
 
+    budget = get_settings().TOOL_LOOP_BUDGET
     start = time.time()
     while True:
         # Safety budget for the tool loop; your API layer should also enforce an outer timeout (~170s).
-        if time.time() - start > 110:
+        remaining = budget - (time.time() - start)
+        if remaining <= 0:
             raise TimeoutError("Tool loop exceeded time budget")
 
-        msg = _chat(messages)
+        msg = await _chat(messages, remaining)
         tool_calls = msg.get("tool_calls") or []
 
         # If no tool calls, treat this as final content
@@ -275,11 +571,11 @@ async def run_agent_for_api(task: str, plan: str = "") -> list:
         # Record the assistant turn that requested tool(s)
         messages.append({"role": "assistant", "content": None, "tool_calls": tool_calls})
 
-        # Execute each tool call and append its result
-        for tc in tool_calls:
-            fn_name = tc["function"]["name"]
-            args = _parse_args(tc["function"].get("arguments"))
-            out = await _call_tool(fn_name, args)
+        # Independent calls overlap; calls that share a file keep their order
+        results = await _run_tool_calls(
+            [(tc["function"]["name"], _parse_args(tc["function"].get("arguments"))) for tc in tool_calls]
+        )
+        for tc, out in zip(tool_calls, results):
             # OpenAI expects role="tool" with tool_call_id and content
             messages.append({"role": "tool", "tool_call_id": tc["id"], "content": out})
 
@@ -295,5 +591,13 @@ if __name__ == "__main__":
     parser.add_argument("--plan", type=str, default=os.getenv("PLAN", ""), help="Optional pre-generated plan")
     args = parser.parse_args()
 
-    result = asyncio.run(run_agent_for_api(args.task, args.plan))
+    async def _cli() -> list:
+        try:
+            return await run_agent_for_api(args.task, args.plan)
+        finally:
+            await stop_browser()
+            await HTTP.aclose()
+            await HTTP_SCRAPER.aclose()
+
+    result = asyncio.run(_cli())
     print(json.dumps(result, ensure_ascii=False))
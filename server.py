@@ -0,0 +1,162 @@
+# server.py
+# FastAPI entrypoint (planner): accepts questions.txt, calls Gemini to plan,
+# saves plan to outputs/abdul_breaked_task_<pid>_<uuid>.txt, invokes executor, returns JSON array.
+# Named server.py, not app.py: that name is shadowed by the app/ package, so an
+# "app:app" import string (needed for uvicorn workers) could never resolve.
+
+from __future__ import annotations
+
+import os
+import io
+import logging
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from app.pipeline import close_gemini_client, plan_with_gemini, warm_up_gemini
+from app.plan_cache import get_plan_cache
+
+# Executor
+from main import (
+    HTTP,
+    HTTP_SCRAPER,
+    run_agent_for_api,
+    start_browser,
+    stop_browser,
+    warm_up_http,
+)
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# App setup
+# -----------------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One-time setup: open the plan cache (schema/dirs) and launch Chromium;
+    # scrapes open a fresh context per request
+    try:
+        await asyncio.to_thread(get_plan_cache)
+    except Exception:
+        logger.warning("Plan cache unavailable at startup; planning will bypass it", exc_info=True)
+    # Best-effort: most scrapes take the plain-HTTP path, and scrape_website launches
+    # lazily anyway, so a missing/broken Chromium must not take the whole app down
+    try:
+        app.state.browser = await start_browser()
+    except Exception:
+        logger.exception("Chromium launch failed at startup; will retry on first browser scrape")
+        app.state.browser = None
+    await asyncio.gather(warm_up_http(), warm_up_gemini())
+    yield
+    try:
+        await stop_browser()
+    finally:
+        # Release pooled planner/executor/scraper connections on shutdown
+        try:
+            await close_gemini_client()
+        finally:
+            await HTTP.aclose()
+            await HTTP_SCRAPER.aclose()
+
+
+app = FastAPI(title="Data Analyst Agent", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# -----------------------------------------------------------------------------
+# Routes
+# -----------------------------------------------------------------------------
+@app.get("/api/health")
+def health():
+    return {
+        "status": "ok",
+        "has_gemini_key": bool(os.getenv("GEMINI_API_KEY")),
+        "has_executor_token": bool(os.getenv("AIPIPE_TOKEN")),
+    }
+
+
+# Uploads larger than this are decoded in a worker thread instead of on the event loop
+_INLINE_DECODE_LIMIT = 64 * 1024
+
+
+def _decode_upload(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8")
+    except Exception:
+        # Try latin-1 as fallback
+        return raw.decode("latin-1")
+
+
+async def _handle_question_upload(file: UploadFile, use_cache: bool = True) -> JSONResponse:
+    if not file:
+        raise HTTPException(status_code=400, detail="File is required")
+
+    # Starlette already spools large uploads to disk and reads them in a threadpool,
+    # so a single read is fine; only the decode needs keeping off the loop.
+    try:
+        raw = await file.read()
+    finally:
+        await file.close()
+
+    if len(raw) > _INLINE_DECODE_LIMIT:
+        text = await asyncio.to_thread(_decode_upload, raw)
+    else:
+        text = _decode_upload(raw)
+
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+
+    # 1) Plan with Gemini
+    try:
+        plan = await plan_with_gemini(text, use_cache=use_cache)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out while planning")
+
+    # 2) Execute end-to-end with executor (ChatGPT/tools)
+    try:
+        final_answer = await asyncio.wait_for(
+            run_agent_for_api(text, plan), timeout=170
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out while executing the plan")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Execution failed: {e}")
+
+    # 3) Return EXACTLY the JSON array
+    return JSONResponse(content=final_answer)
+
+
+@app.post("/api/")
+@app.post("/api/analyze")  # alias for convenience
+async def analyze(file: UploadFile = File(...), no_cache: bool = False):
+    # ?no_cache=1 forces a fresh Gemini plan
+    return await _handle_question_upload(file, use_cache=not no_cache)
+
+
+@app.get("/")
+def root():
+    return {"message": "Data Analyst Agent is running. POST /api/ with questions.txt"}
+
+
+# -----------------------------------------------------------------------------
+# Local dev
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import uvicorn
+    # loop/http="auto" pick uvloop + httptools when installed (uvicorn[standard])
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+        loop="auto",
+        http="auto",
+        reload=False,
+    )
@@ -0,0 +1,7 @@
+# tests/conftest.py
+# Make the repo root importable (app/, main.py, tools/) when running `pytest` from anywhere.
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
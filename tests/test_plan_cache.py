@@ -0,0 +1,69 @@
+# tests/test_plan_cache.py
+# SQLite plan cache: exact hits, planner fingerprints, LFU eviction, best-effort wrappers.
+
+import sqlite3
+
+import pytest
+
+from app import plan_cache
+from app.plan_cache import PlanCache, lookup_plan, planner_fingerprint, store_plan
+
+PLANNER = planner_fingerprint("gemini-test", "Break the task into steps.")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PlanCache(str(tmp_path / "plans.sqlite3"), max_entries=2)
+
+
+def test_exact_hit_ignores_whitespace(cache):
+    cache.put("Scrape https://example.com/a\nand plot it", "PLAN A", PLANNER)
+    assert cache.get("Scrape https://example.com/a and plot it  ", PLANNER) == "PLAN A"
+    assert cache.get("Scrape https://example.com/b and plot it", PLANNER) is None
+
+
+def test_changed_prompt_or_model_is_a_miss(cache):
+    cache.put("task", "PLAN", PLANNER)
+    assert cache.get("task", planner_fingerprint("gemini-test", "Edited prompt.")) is None
+    assert cache.get("task", planner_fingerprint("other-model", "Break the task into steps.")) is None
+
+
+def test_lfu_eviction_keeps_fresh_entry(cache):
+    cache.put("used", "PLAN USED", PLANNER)
+    cache.put("unused", "PLAN UNUSED", PLANNER)
+    assert cache.get("used", PLANNER) == "PLAN USED"
+
+    cache.put("fresh", "PLAN FRESH", PLANNER)
+
+    assert cache.get("fresh", PLANNER) == "PLAN FRESH"
+    assert cache.get("used", PLANNER) == "PLAN USED"
+    assert cache.get("unused", PLANNER) is None
+
+
+def test_full_cache_still_admits_new_plans(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.sqlite3"), max_entries=1)
+    cache.put("old", "PLAN OLD", PLANNER)
+    for _ in range(3):
+        cache.get("old", PLANNER)
+
+    cache.put("new", "PLAN NEW", PLANNER)
+
+    assert cache.get("new", PLANNER) == "PLAN NEW"
+    assert cache.get("old", PLANNER) is None
+
+
+def test_failures_count_as_misses(monkeypatch):
+    def broken():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(plan_cache, "get_plan_cache", broken)
+
+    assert lookup_plan("task", PLANNER) is None
+    store_plan("task", "PLAN", PLANNER)  # must not raise
+
+
+def test_disabled_cache_is_a_miss(monkeypatch):
+    monkeypatch.setattr(plan_cache, "get_plan_cache", lambda: None)
+
+    assert lookup_plan("task", PLANNER) is None
+    store_plan("task", "PLAN", PLANNER)
@@ -0,0 +1,40 @@
+# tests/test_tool_calls.py
+# Ordering of one assistant turn's batched tool calls in the executor.
+
+import asyncio
+
+import main
+
+
+def test_extraction_sees_page_scraped_in_same_turn(tmp_path, monkeypatch):
+    page = str(tmp_path / "page.html")
+    main._save_html(page, "<table><tr><td>OLD PAGE</td></tr></table>")
+    main.get_relevant_data(page, "td")  # old tree is now cached
+
+    async def slow_fetch(url):
+        await asyncio.sleep(0.2)
+        return "<table><tr><td>NEW PAGE</td></tr></table>"
+
+    monkeypatch.setattr(main, "scrape_via_http", slow_fetch)
+
+    results = asyncio.run(
+        main._run_tool_calls(
+            [
+                ("scrape_website", {"url": "https://example.com", "output_file": page}),
+                ("get_relevant_data", {"file_name": page, "js_selector": "td"}),
+            ]
+        )
+    )
+
+    assert '"NEW PAGE"' in results[1]
+
+
+def test_failed_call_is_reported_to_the_model(tmp_path):
+    missing = str(tmp_path / "missing.html")
+
+    results = asyncio.run(
+        main._run_tool_calls([("get_relevant_data", {"file_name": missing, "js_selector": "td"})])
+    )
+
+    assert '"ok": false' in results[0]
+    assert "FileNotFoundError" in results[0]
@@ -1,14 +1,33 @@
 # tools/dom_structure.py
 # Produce a compact DOM outline from saved HTML to help craft stable CSS selectors.
 # CLI:
-#   python -m tools.dom_structure --file outputs/scraped_content.html --depth 2 --max-children 8
+#   python -m tools.dom_structure --file outputs/scraped_content.html --depth 2 --max-children 8 --max-lines 200
 
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Iterable, List, Tuple, Optional
+from itertools import groupby, islice
+from typing import Iterator, List
 
-from bs4 import BeautifulSoup, Tag
+import soupsieve as sv
+from bs4 import Tag
+
+from app.html_cache import load_soup
+
+# Probed by suggest_selectors, in output order: common main content areas first,
+# then typical Wikipedia tables and sections.
+SELECTOR_CANDIDATES = (
+    "main#content",
+    "main",
+    "article",
+    "#content",
+    "#mw-content-text",
+    "table.wikitable",
+    "table.infobox",
+    "div.mw-parser-output h2",
+    "div.mw-parser-output h3",
+)
+_CANDIDATE_PATTERNS = [(sel, sv.compile(sel)) for sel in SELECTOR_CANDIDATES]
+_ANY_CANDIDATE = sv.compile(", ".join(SELECTOR_CANDIDATES))
 
 
 def _node_label(el: Tag) -> str:
@@ -25,18 +44,22 @@ def _node_label(el: Tag) -> str:
     return out
 
 
-def _children(el: Tag) -> Iterable[Tag]:
-    for child in el.children:
-        if isinstance(child, Tag):
-            yield child
+def _children(el: Tag) -> Iterator[Tag]:
+    """Direct child tags, produced lazily so callers can stop early."""
+    return (child for child in el.children if isinstance(child, Tag))
+
 
+class _Done(Exception):
+    """Raised inside dom_outline's walk once the line budget is spent."""
 
-def dom_outline(html_file: str, depth: int = 2, max_children: int = 8) -> List[str]:
+
+def dom_outline(html_file: str, depth: int = 2, max_children: int = 8, max_lines: int = 200) -> List[str]:
     """
     Return a list of text lines representing a compact DOM outline for the saved HTML.
+    Runs of identically-labelled siblings collapse into one line (e.g. "- li.item ×300");
+    max_children caps the number of such lines per node and max_lines caps the total.
     """
-    html = Path(html_file).read_text(encoding="utf-8")
-    soup = BeautifulSoup(html, "html.parser")
+    soup = load_soup(html_file)
 
     root = soup.body or soup
     lines: List[str] = []
@@ -44,16 +67,25 @@ def dom_outline(html_file: str, depth: int = 2, max_children: int = 8) -> List[s
     def walk(node: Tag, level: int):
         if level > depth:
             return
-        kids = list(_children(node))[:max_children]
-        for i, k in enumerate(kids):
-            indent = "  " * level
-            lines.append(f"{indent}- {_node_label(k)}")
-            walk(k, level + 1)
+        indent = "  " * level
+        runs = groupby(_children(node), key=_node_label)
+        for label, run in islice(runs, max(max_children, 0)):
+            first = next(run)
+            count = 1 + sum(1 for _ in run)
+            lines.append(f"{indent}- {label}" + (f" ×{count}" if count > 1 else ""))
+            if len(lines) >= max_lines:
+                raise _Done()
+            # Siblings in a run share a label; outlining the first is representative
+            walk(first, level + 1)
 
     # start from <main> if present; it tends to be semantically relevant
     start = soup.select_one("main") or root
     lines.append(_node_label(start))
-    walk(start, 1)
+    try:
+        if len(lines) < max_lines:
+            walk(start, 1)
+    except _Done:
+        pass
     return lines
 
 
@@ -61,29 +93,19 @@ def suggest_selectors(html_file: str, max_suggestions: int = 10) -> List[str]:
     """
     Suggest a few potentially-stable selectors for common content areas (main, tables, headings).
     """
-    html = Path(html_file).read_text(encoding="utf-8")
-    soup = BeautifulSoup(html, "html.parser")
-
-    suggestions: List[str] = []
-
-    # Common main content area
-    for sel in ["main#content", "main", "article", "#content", "#mw-content-text"]:
-        if soup.select_one(sel):
-            suggestions.append(sel)
-
-    # Typical Wikipedia tables and sections
-    for sel in ["table.wikitable", "table.infobox", "div.mw-parser-output h2", "div.mw-parser-output h3"]:
-        if soup.select_one(sel):
-            suggestions.append(sel)
-
-    # Deduplicate, trim
-    out: List[str] = []
-    for s in suggestions:
-        if s not in out:
-            out.append(s)
-        if len(out) >= max_suggestions:
+    soup = load_soup(html_file)
+
+    # One walk over the tree with the combined selector; map each hit back to the
+    # candidate(s) it satisfies and stop as soon as every candidate has been seen.
+    found = set()
+    for el in _ANY_CANDIDATE.iselect(soup):
+        for sel, pattern in _CANDIDATE_PATTERNS:
+            if sel not in found and pattern.match(el):
+                found.add(sel)
+        if len(found) == len(SELECTOR_CANDIDATES):
             break
-    return out
+
+    return [sel for sel in SELECTOR_CANDIDATES if sel in found][:max_suggestions]
 
 
 if __name__ == "__main__":
@@ -93,9 +115,10 @@ if __name__ == "__main__":
     parser.add_argument("--file", required=True, help="Path to saved HTML file")
     parser.add_argument("--depth", type=int, default=2)
     parser.add_argument("--max-children", type=int, default=8)
+    parser.add_argument("--max-lines", type=int, default=200)
     args = parser.parse_args()
 
-    for line in dom_outline(args.file, depth=args.depth, max_children=args.max_children):
+    for line in dom_outline(args.file, depth=args.depth, max_children=args.max_children, max_lines=args.max_lines):
         print(line)
 
     from pprint import pprint
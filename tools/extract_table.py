@@ -1,5 +1,5 @@
 # tools/extract_table.py
-# HTML extraction helpers using BeautifulSoup.
+# HTML extraction helpers using BeautifulSoup (CSS selectors) and lxml (table export).
 # Usable as import or CLI:
 #   python -m tools.extract_table --file outputs/scraped_content.html --selector "main#content table.wikitable"
 
@@ -9,7 +9,16 @@ import csv
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+
+from app.html_cache import compile_selector, load_soup
+
+# First table with a "wikitable" class token, in document order (same hit as the
+# CSS "main#content table.wikitable, table.wikitable").
+_WIKITABLE = etree.XPath("(//table[contains(concat(' ', normalize-space(@class), ' '), ' wikitable ')])[1]")
+# The strings bs4's get_text() would see: text nodes only, no <script>/<style> bodies
+_CELL_TEXT = etree.XPath(".//text()[not(ancestor::script) and not(ancestor::style)]")
 
 
 def get_relevant_data(file_name: str, js_selector: Optional[str] = None) -> Dict[str, Any]:
@@ -18,11 +27,10 @@ def get_relevant_data(file_name: str, js_selector: Optional[str] = None) -> Dict
     Returns:
       {"data": list[str] | str, "count": int?, "selector": str?}
     """
-    html = Path(file_name).read_text(encoding="utf-8")
-    soup = BeautifulSoup(html, "html.parser")
+    soup = load_soup(file_name)
 
     if js_selector:
-        elements = soup.select(js_selector)
+        elements = compile_selector(js_selector).select(soup)
         return {
             "data": [el.get_text(strip=True) for el in elements],
             "count": len(elements),
@@ -33,27 +41,35 @@ def get_relevant_data(file_name: str, js_selector: Optional[str] = None) -> Dict
 
 
 def _table_to_rows(table) -> List[List[str]]:
-    """Convert a BeautifulSoup <table> into 2D list of strings."""
+    """
+    Convert an lxml <table> element into 2D list of strings.
+    Cell text matches bs4's get_text(strip=True): each text node stripped, then joined.
+    """
     rows = []
-    for tr in table.select("tr"):
-        cells = tr.find_all(["th", "td"])
-        rows.append([c.get_text(strip=True) for c in cells])
+    for tr in table.iter("tr"):
+        rows.append(["".join(t.strip() for t in _CELL_TEXT(c)) for c in tr.iter("th", "td")])
     return rows
 
 
 def extract_first_wikitable_to_csv(html_file: str, csv_out: str) -> Dict[str, Any]:
     """
     Convenience for Wikipedia: find the first .wikitable and write to CSV.
+    Parses with lxml directly (no bs4 tree) since this only needs one table.
     Returns meta info with row counts and output path.
     """
-    html = Path(html_file).read_text(encoding="utf-8")
-    soup = BeautifulSoup(html, "html.parser")
-
-    tbl = soup.select_one("main#content table.wikitable, table.wikitable")
-    if not tbl:
+    # Bytes + explicit encoding: lxml refuses str input that carries an
+    # <?xml ... encoding=...?> declaration, and saved files are always UTF-8
+    data = Path(html_file).read_bytes()
+    try:
+        doc = lxml_html.document_fromstring(data, parser=lxml_html.HTMLParser(encoding="utf-8"))
+    except etree.ParserError:  # empty document
+        doc = None
+
+    hits = _WIKITABLE(doc) if doc is not None else []
+    if not hits:
         return {"ok": False, "error": "No .wikitable found"}
 
-    rows = _table_to_rows(tbl)
+    rows = _table_to_rows(hits[0])
 
     out = Path(csv_out)
     out.parent.mkdir(parents=True, exist_ok=True)